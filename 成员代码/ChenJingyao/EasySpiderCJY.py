@@ -1,13 +1,36 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
 import time
 import random
 from datetime import datetime
 import re
 
+# 预编译的 URL 协议校验正则，避免每个链接重复构造判断
+_URL_RE = re.compile(r'^https?://')
+
+# 只解析 <a> 和 <title>，其余子树在建树阶段即被丢弃
+_STRAINER = SoupStrainer(['a', 'title'])
+
+# aiohttp 为可选依赖，仅异步批量抓取时需要
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# 优先使用 C 实现的 lxml 解析器（大页面解析快 5-10 倍），
+# 未安装 lxml 时回退到内置的 html.parser
+try:
+    BeautifulSoup('', 'lxml')
+    _BS4_PARSER = 'lxml'
+except FeatureNotFound:
+    _BS4_PARSER = 'html.parser'
+
 class SimpleSpider:
     """
     简单网页爬虫类：用于抓取网页标题和所有有效链接。
@@ -26,6 +49,13 @@ class SimpleSpider:
         }
         self.timeout = 10
         self.max_retries = 3
+        # 复用 TCP/TLS 连接：同一 Session 通过 urllib3 连接池保持 keep-alive，
+        # 避免每次请求都重新握手
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=64, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
     def get_page(self, url):
         """
@@ -33,42 +63,96 @@ class SimpleSpider:
         参数:
             url (str): 要访问的网页地址。
         返回:
-            str or None: HTML 内容或失败时返回 None。
+            bytes or None: HTML 原始字节或失败时返回 None。
         """
         for i in range(self.max_retries):
             try:
-                response = requests.get(url, headers=self.headers, timeout=self.timeout)
+                response = self.session.get(url, timeout=self.timeout)
                 response.raise_for_status()
-                response.encoding = 'utf-8'
-                return response.text
+                # 返回原始字节，编码嗅探交给解析器，省去整页 Python 级解码
+                return response.content
             except Exception as e:
                 print(f"[错误] 第 {i + 1} 次请求失败: {type(e).__name__} - {str(e)}")
                 if i < self.max_retries - 1:
                     time.sleep(random.uniform(1, 3))
         return None
 
+    def get_pages(self, urls, workers=16):
+        """
+        用线程池并行抓取多个网页；抓取为 I/O 密集型，
+        socket 等待期间释放 GIL，请求彼此重叠。
+        参数:
+            urls (list): 要抓取的网页地址列表。
+            workers (int): 线程池大小（Session 连接池已按此放大）。
+        返回:
+            list: 与 urls 顺序对应的 HTML 内容列表，失败项为 None。
+        """
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.get_page, urls))
+
+    async def _fetch_async(self, session, url, sem):
+        """
+        在信号量限制下异步抓取单个网页，失败时指数退避重试。
+        """
+        async with sem:
+            for i in range(self.max_retries):
+                try:
+                    async with session.get(url, timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                        response.raise_for_status()
+                        return await response.read()
+                except Exception as e:
+                    print(f"[错误] 第 {i + 1} 次请求失败 ({url}): {type(e).__name__} - {str(e)}")
+                    if i < self.max_retries - 1:
+                        await asyncio.sleep(2 ** i + random.random())
+        return None
+
+    async def get_pages_async(self, urls, concurrency=64):
+        """
+        并发抓取多个网页，将 N 次串行往返合并为一批异步请求。
+        参数:
+            urls (list): 要抓取的网页地址列表。
+            concurrency (int): 最大并发请求数。
+        返回:
+            list: 与 urls 顺序对应的 HTML 内容列表，失败项为 None。
+        """
+        if aiohttp is None:
+            raise RuntimeError("未安装 aiohttp，无法使用异步批量抓取。")
+        sem = asyncio.Semaphore(concurrency)
+        connector = aiohttp.TCPConnector(limit_per_host=64)
+        async with aiohttp.ClientSession(headers=self.headers, connector=connector) as session:
+            tasks = (self._fetch_async(session, url, sem) for url in urls)
+            return await asyncio.gather(*tasks)
+
+    def close(self):
+        """
+        关闭底层 Session，释放连接池资源。
+        """
+        self.session.close()
+
     def parse_page(self, html):
         """
         使用 BeautifulSoup 解析网页，提取标题和所有有效超链接。
         参数:
-            html (str): 网页 HTML 内容。
+            html (bytes): 网页 HTML 原始字节。
         返回:
             list: 包含字典的结果列表，每项包括 title 和 url。
         """
         if not html:
             return []
 
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = BeautifulSoup(html, _BS4_PARSER, parse_only=_STRAINER,
+                             from_encoding='utf-8')
         results = []
 
         try:
             title = soup.title.string.strip() if soup.title and soup.title.string else "无标题"
-            for link in soup.find_all('a'):
-                href = link.get('href')
-                text = link.get_text().strip()
-                if href and href.startswith(('http://', 'https://')):
+            # href=True 让无 href 的标签在 C 层被过滤；
+            # link.string 不递归子节点，比 get_text() 轻量
+            for link in soup.find_all('a', href=True):
+                href = link['href']
+                if _URL_RE.match(href):
                     results.append({
-                        'title': text or '无文本',
+                        'title': (link.string or '').strip() or '无文本',
                         'url': href
                     })
             return results
@@ -89,13 +173,14 @@ class SimpleSpider:
             filename = f"spider_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
 
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
+            # 加大写缓冲并按条目整体写出，减少文本 IO 层的多次小写入
+            with open(filename, 'w', encoding='utf-8', buffering=1 << 20) as f:
                 f.write(f"爬取时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
                 f.write("=" * 50 + "\n")
-                for item in results:
-                    f.write(f"标题: {item['title']}\n")
-                    f.write(f"链接: {item['url']}\n")
-                    f.write("-" * 30 + "\n")
+                f.writelines(
+                    f"标题: {item['title']}\n链接: {item['url']}\n{'-' * 30}\n"
+                    for item in results
+                )
             print(f"[提示] 结果已保存到文件: {filename}")
             return True
         except Exception as e:
@@ -113,7 +198,7 @@ def is_valid_url(url):
     返回:
         bool: 合法返回 True。
     """
-    return url.startswith("http://") or url.startswith("https://")
+    return _URL_RE.match(url) is not None
 
 def main():
     """
@@ -121,31 +206,34 @@ def main():
     """
     spider = SimpleSpider()
 
-    print("请输入要爬取的网页地址：")
-    url = input().strip()
+    try:
+        print("请输入要爬取的网页地址：")
+        url = input().strip()
 
-    if not url:
-        print("[错误] URL 不能为空。")
-        return
-    if not is_valid_url(url):
-        print("[错误] 请输入合法的 HTTP 或 HTTPS 链接。")
-        return
+        if not url:
+            print("[错误] URL 不能为空。")
+            return
+        if not is_valid_url(url):
+            print("[错误] 请输入合法的 HTTP 或 HTTPS 链接。")
+            return
 
-    print(f"[提示] 开始爬取: {url}")
-    html = spider.get_page(url)
+        print(f"[提示] 开始爬取: {url}")
+        html = spider.get_page(url)
 
-    if not html:
-        print("[错误] 获取网页内容失败。")
-        return
+        if not html:
+            print("[错误] 获取网页内容失败。")
+            return
 
-    results = spider.parse_page(html)
+        results = spider.parse_page(html)
 
-    if not results:
-        print("[提示] 未提取到任何有效链接。")
-        return
+        if not results:
+            print("[提示] 未提取到任何有效链接。")
+            return
 
-    print(f"[提示] 共找到 {len(results)} 个链接。")
-    spider.save_results(results)
+        print(f"[提示] 共找到 {len(results)} 个链接。")
+        spider.save_results(results)
+    finally:
+        spider.close()
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,14 @@
 import os
 import base64
 import logging
+import shutil
+import tempfile
+import urllib.parse
 from datetime import datetime, timedelta
+from functools import lru_cache
 from io import BytesIO
-from flask import Flask, render_template, request, redirect, url_for
-from werkzeug.utils import secure_filename
+from typing import Optional
+from flask import Flask, Response, render_template, request, redirect, url_for
 from PIL import Image
 import cv2
 import numpy as np
@@ -24,24 +28,27 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 
 logging.basicConfig(level=logging.INFO)
 
+# 微信二维码检测器初始化要从磁盘加载模型，进程内只构造一次、跨请求复用
+try:
+    _QR_DETECTOR = cv2.wechat_qrcode_WeChatQRCode()
+except Exception as init_error:
+    logging.error("无法初始化微信二维码识别模型: %s", str(init_error))
+    _QR_DETECTOR = None
+
 # --- 工具函数区 ---
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+def allowed_file(filename: str) -> bool:
+    return '.' in filename and \
+        filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
-def generate_qr_code(data: str,
-                     version: int = 5,
-                     box_size: int = 10,
-                     border: int = 4) -> PilImage:
+def generate_qr_code(data, version=None, box_size=6, border=4):
     """
     生成二维码图片
     :param data: 要编码的字符串
-    :param version: 二维码复杂度 (1-40)
+    :param version: 二维码复杂度 (1-40)，None 时自动选最小
     :param box_size: 每个小格子的像素数
     :param border: 边框宽度（单位：格子数）
     :return: PIL Image 对象
     """
-
-def generate_qr_code(data, version=5, box_size=10, border=4):
     qr = qrcode.QRCode(
         version=version,
         error_correction=qrcode.constants.ERROR_CORRECT_H,
@@ -50,34 +57,37 @@ def generate_qr_code(data, version=5, box_size=10, border=4):
     )
     qr.add_data(data)
     qr.make(fit=True)
-    return qr.make_image(fill_color="black", back_color="white")
+    # 转为 1 位色深：PNG 编码更快，体积远小于 RGB
+    return qr.make_image(fill_color="black", back_color="white").convert('1')
+
+@lru_cache(maxsize=1024)
+def _qr_png_bytes(data: str) -> bytes:
+    """渲染二维码 PNG 并按内容缓存；生成是纯函数，重复访问直接命中缓存"""
+    img = generate_qr_code(data)
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
 
-def adjust_create_time(original_str: str) -> str:
+def adjust_qr_createtime_param(original_str):
     """
     将 URL 参数中的 createTime 增加 1 小时
     :param original_str: 原始带参数字符串
     :return: 调整后的字符串
     """
-
-def adjust_qr_createtime_param(original_str):
+    # parse_qsl/urlencode 是 C 加速的标准解析，替代手写 split/startswith 扫描
+    params = dict(urllib.parse.parse_qsl(original_str, keep_blank_values=True))
+    if 'createTime' not in params:
+        return original_str
     try:
-        parts = original_str.split('&')
-        for i in range(len(parts)):
-            if parts[i].startswith('createTime='):
-                _, time_value = parts[i].split('=', 1)
-                dt = datetime.strptime(time_value, "%Y-%m-%dT%H:%M:%S.%f")
-                dt += timedelta(hours=1)
-                new_time = dt.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
-                parts[i] = f"createTime={new_time}"
-                break
-        return '&'.join(parts)
-    except Exception as e:
-        print(f"处理失败: {str(e)}")
-        return original_str  
-
-def allowed_file(filename: str) -> bool:
-    return '.' in filename and \
-        filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+        dt = datetime.strptime(params['createTime'], "%Y-%m-%dT%H:%M:%S.%f")
+    except ValueError as e:
+        app.logger.error(f"创建时间调整失败: {str(e)}")
+        return original_str
+    dt += timedelta(hours=1)
+    params['createTime'] = dt.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+    # quote_via=quote 且放行 ':' '.'，时间值等原文保持原样，
+    # 不会被百分号转义成与原串不兼容的形式
+    return urllib.parse.urlencode(params, quote_via=urllib.parse.quote, safe=':.')
 
 def read_qr_code(file_bytes: bytes) -> Optional[str]:
     """
@@ -88,12 +98,18 @@ def read_qr_code(file_bytes: bytes) -> Optional[str]:
     try:
         if len(file_bytes) > app.config['MAX_CONTENT_LENGTH']:
             raise ValueError("文件过大")
-        image = Image.open(io.BytesIO(file_bytes))
-        img = cv2.cvtColor(numpy.asarray(image), cv2.COLOR_RGB2BGR)
-        detector = cv2.wechat_qrcode_WeChatQRCode()
-        data, _, _ = detector.detectAndDecode(img)
-        return data or None
-        
+        # imdecode 直接得到 BGR 图像，省去 PIL 解码、numpy 拷贝和颜色空间转换
+        arr = np.frombuffer(file_bytes, dtype=np.uint8)
+        img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+        if img is None or _QR_DETECTOR is None:
+            return None
+        res, _ = _QR_DETECTOR.detectAndDecode(img)
+        return res[0] if res else None
+    except Exception as e:
+        app.logger.error(f"二维码解析失败: {str(e)}")
+        return None
+
+
 def is_image(file_bytes: bytes) -> bool:
     """
     使用 python-magic 检测文件 MIME 类型并且使用 PIL 做二次验证
@@ -104,31 +120,11 @@ def is_image(file_bytes: bytes) -> bool:
             return False
 
         # 使用 PIL 验证文件结构
-        img = Image.open(io.BytesIO(file_bytes))
+        img = Image.open(BytesIO(file_bytes))
         img.verify()
         return True
     except Exception:
         return False
-        app.logger.error(f"创建时间调整失败: {str(e)}")
-        return original_str
-
-def read_qr_code_from_base64(base64_data):
-    try:
-        img_bytes = base64.b64decode(base64_data)
-        image = Image.open(BytesIO(img_bytes))
-        img = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
-
-        try:
-            detect_obj = cv2.wechat_qrcode_WeChatQRCode()
-        except Exception as init_error:
-            app.logger.error("无法初始化微信二维码识别模型: %s", str(init_error))
-            return None
-
-        res = detect_obj.detectAndDecode(img)
-        return res[0] if res[0] else None
-    except Exception as e:
-        app.logger.error(f"二维码解析失败: {str(e)}")
-        return None
 
 # --- 路由区 ---
 @app.route('/', methods=['GET', 'POST'])
@@ -145,25 +141,23 @@ def home():
             return "文件类型不合法"
 
         if file:
-            file_data = file.read()
-            qr_text = read_qr_code(file_data)
+            # 分块流入有界的 SpooledTemporaryFile：1MB 内留在内存，
+            # 超过阈值自动落盘，上传上限提高时并发请求也不会占满内存
+            with tempfile.SpooledTemporaryFile(max_size=1 << 20) as spooled:
+                shutil.copyfileobj(file.stream, spooled, length=64 * 1024)
+                spooled.seek(0)
+                # imdecode 需要连续缓冲，解码前做一次有界读取
+                file_data = spooled.read()
             if not is_image(file_data):
                 return "不是合法文件"
-            qr_text = read_qr_code(base64.b64encode(file_data).decode("utf-8"))
+            # 原始字节直接解析，省掉一次 b64encode + b64decode 往返
+            qr_text = read_qr_code(file_data)
             if qr_text:
+                if len(qr_text) > MAX_QR_TEXT_LENGTH:
+                    return "二维码内容过长，禁止解析"
                 return redirect(url_for('show_image', filename='pic', qr_text=qr_text))
             else:
                 return "未检测到二维码或读取失败"
-        file_data = file.read()
-        encoded_data = base64.b64encode(file_data).decode("utf-8")
-        qr_text = read_qr_code_from_base64(encoded_data)
-
-        if qr_text:
-            if len(qr_text) > MAX_QR_TEXT_LENGTH:
-                return "二维码内容过长，禁止解析"
-            return redirect(url_for('show_image', filename='pic', qr_text=qr_text))
-        else:
-            return "未检测到二维码或读取失败"
 
     return render_template('index.html')
 
@@ -173,11 +167,7 @@ def show_image(filename):
     qr_data = request.args.get('data', adjust_qr_createtime_param(qr_text))
 
     try:
-        img = generate_qr_code(qr_data)
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        buffer.seek(0)
-        image_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        image_data = base64.b64encode(_qr_png_bytes(qr_data)).decode('utf-8')
 
         return render_template('show.html',
                                qr_text=qr_text,
@@ -189,8 +179,21 @@ def show_image(filename):
         app.logger.error(f"二维码生成失败: {str(e)}")
         return "二维码生成失败", 500
 
+@app.route('/qr.png')
+def qr_png():
+    """直接以 image/png 返回二维码，供 <img src> 引用，避免 base64 内嵌网页"""
+    data = request.args.get('data', '')
+    if not data or len(data) > MAX_QR_TEXT_LENGTH:
+        return "参数不合法", 400
+
+    try:
+        return Response(_qr_png_bytes(data), mimetype='image/png')
+    except Exception as e:
+        app.logger.error(f"二维码生成失败: {str(e)}")
+        return "二维码生成失败", 500
+
 # --- 启动区 ---
-if __name__ == '____':
+if __name__ == '__main__':
     if not os.path.exists(app.config['UPLOAD_FOLDER']):
         os.makedirs(app.config['UPLOAD_FOLDER'])
     app.run(debug=True)
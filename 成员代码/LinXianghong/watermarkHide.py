@@ -3,7 +3,20 @@ from PIL import Image
 import os
 import matplotlib.pyplot as plt
 import pywt
-from scipy.fftpack import dct, idct
+from scipy.fft import dct
+
+# 预计算 8×8 正交DCT变换矩阵：D @ X @ D.T 即二维DCT，D.T @ Y @ D 即逆变换
+_DCT8 = dct(np.eye(8), norm="ortho", axis=0)
+
+# 按 (shape, dtype) 缓存的复用缓冲，批量实验时避免每次调用都分配大数组
+_BUFFER_CACHE = {}
+
+def _cached_buffer(shape, dtype):
+    key = (shape, np.dtype(dtype).str)
+    buf = _BUFFER_CACHE.get(key)
+    if buf is None:
+        buf = _BUFFER_CACHE[key] = np.empty(shape, dtype)
+    return buf
  
 # 转换图像为numpy数组
 # is_watermark为True时转为灰度图，False时保持RGB格式
@@ -21,50 +34,55 @@ def convert_image(image_name, size, is_watermark=False):
     img.save(img_path_save)
     return image_array
 
-# 对图像进行小波变换
+# 对图像进行小波变换（只在最后两个维度上变换，支持批量通道）
 def process_dwt(image_array, level=1):
-    coeffs = pywt.wavedec2(image_array, 'haar', level=level)
+    coeffs = pywt.wavedec2(image_array, 'haar', level=level, axes=(-2, -1))
     return coeffs
 
-# 对图像进行分块DCT变换
-def apply_dct(image_array):
-    size = image_array.shape[0]
-    all_subdct = np.empty_like(image_array)
-    for i in range(0, size, 8):
-        for j in range(0, size, 8):
-            subpixels = image_array[i:i + 8, j:j + 8]
-            subdct = dct(dct(subpixels.T, norm="ortho").T, norm="ortho")
-            all_subdct[i:i + 8, j:j + 8] = subdct
-    return all_subdct
+# 把图像重排成 (..., nb, nb, 8, 8) 的分块张量
+def _to_blocks(image_array):
+    h, w = image_array.shape[-2:]
+    lead = image_array.shape[:-2]
+    return image_array.reshape(*lead, h // 8, 8, w // 8, 8).swapaxes(-3, -2)
+
+# 对图像进行分块DCT变换（所有 8×8 块一次批量矩阵乘，走 BLAS）
+# out 为 None 时复用模块级缓存的缓冲，后续同尺寸调用会覆盖之前的返回值
+def apply_dct(image_array, out=None):
+    blocks = _to_blocks(image_array)
+    all_subdct = np.matmul(_DCT8 @ blocks, _DCT8.T,
+                           out=_cached_buffer(blocks.shape, blocks.dtype))
+    if out is None:
+        out = _cached_buffer(image_array.shape, image_array.dtype)
+    np.copyto(_to_blocks(out), all_subdct)
+    return out
 
-# 进行DCT逆变换
-def inverse_dct(all_subdct):
-    size = all_subdct.shape[0]
-    all_subidct = np.empty_like(all_subdct)
-    for i in range(0, size, 8):
-        for j in range(0, size, 8):
-            subidct = idct(idct(all_subdct[i:i + 8, j:j + 8].T, norm="ortho").T, norm="ortho")
-            all_subidct[i:i + 8, j:j + 8] = subidct
-    return all_subidct
+# 进行DCT逆变换（缓冲复用策略同 apply_dct）
+def inverse_dct(all_subdct, out=None):
+    blocks = _to_blocks(all_subdct)
+    all_subidct = np.matmul(_DCT8.T @ blocks, _DCT8,
+                            out=_cached_buffer(blocks.shape, blocks.dtype))
+    if out is None:
+        out = _cached_buffer(all_subdct.shape, all_subdct.dtype)
+    np.copyto(_to_blocks(out), all_subidct)
+    return out
 
 # 在DWT低频系数中嵌入水印
 def embed_watermark(watermark_array, dwt_coeffs):
     # 获取低频系数
     LL = dwt_coeffs[0]
-    # 对低频系数进行DCT变换
+    # 对低频系数进行DCT变换（多通道时沿通道轴批量广播）
     dct_coeffs = apply_dct(LL)
-    # 将水印展平并二值化
-    watermark_flat = (watermark_array.ravel() > 128).astype(np.float64)
-    ind = 0
-    # 在DCT系数中嵌入水印
-    for x in range(0, dct_coeffs.shape[0], 8):
-        for y in range(0, dct_coeffs.shape[1], 8):
-            if ind < watermark_flat.size:
-                if(watermark_flat[ind] == 1) :
-                    dct_coeffs[x+1, y+1] = dct_coeffs[x+2, y+2] + 80
-                elif(watermark_flat[ind] == 0) :
-                    dct_coeffs[x+1, y+1] = dct_coeffs[x+2, y+2] - 80
-                ind += 1
+    # 多通道输入时水印只嵌入第一个（R）通道
+    target = dct_coeffs[0] if dct_coeffs.ndim == 3 else dct_coeffs
+    # 将水印展平并二值化成 ±1 符号
+    bits = (watermark_array.ravel() > 128).astype(np.float64) * 2 - 1
+    # 所有块原点坐标一次构造，按行优先顺序与原循环保持一致
+    nb = target.shape[0] // 8
+    xs, ys = np.meshgrid(np.arange(nb) * 8, np.arange(nb) * 8, indexing='ij')
+    xs, ys = xs.ravel(), ys.ravel()
+    # 在DCT系数中嵌入水印（gather/scatter 整体完成，无逐块循环）
+    n = min(bits.size, xs.size)
+    target[xs[:n] + 1, ys[:n] + 1] = target[xs[:n] + 2, ys[:n] + 2] + 80 * bits[:n]
     # DCT逆变换
     LL_watermarked = inverse_dct(dct_coeffs)
 
@@ -78,20 +96,16 @@ def embed_watermark_to_image(image_name, watermark_name, output_name):
     # 读取原始图像(RGB)和水印图像(灰度)
     image_array = convert_image(image_name, 4096, False)
     watermark_array = convert_image(watermark_name, 256, True)
-    # 分离RGB通道
-    r_channel = image_array[:,:,0]
-    g_channel = image_array[:,:,1]
-    b_channel = image_array[:,:,2]
-    # 对R通道进行DWT变换
-    dwt_coeffs = process_dwt(r_channel)
-    # 嵌入水印
+    # 通道维前置为 (3, H, W)，三个通道一次批量 DWT/DCT
+    channels = image_array.transpose(2, 0, 1)
+    dwt_coeffs = process_dwt(channels)
+    # 嵌入水印（仅写入 R 通道的低频系数）
     dwt_coeffs_watermarked = embed_watermark(watermark_array, dwt_coeffs)
-    # 小波逆变换得到嵌入水印后的R通道
-    r_channel_watermarked = pywt.waverec2(dwt_coeffs_watermarked, 'haar')
-    # 处理像素值范围
-    r_channel_watermarked = np.clip(r_channel_watermarked, 0, 255)
-    # 重新组合RGB通道
-    watermarked_image = np.dstack((r_channel_watermarked, g_channel, b_channel)).astype(np.uint8)
+    # 小波逆变换得到嵌入水印后的各通道
+    channels_watermarked = pywt.waverec2(dwt_coeffs_watermarked, 'haar', axes=(-2, -1))
+    # 处理像素值范围并还原 (H, W, 3) 通道顺序；
+    # 先四舍五入再截断，haar 往返的 1e-13 级浮点误差不会把整数像素拉低 1
+    watermarked_image = np.clip(np.rint(channels_watermarked), 0, 255).transpose(1, 2, 0).astype(np.uint8)
     # 保存结果
     img = Image.fromarray(watermarked_image)
     img.save(os.path.join('./result', output_name))
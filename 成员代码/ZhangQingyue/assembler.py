@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import re
+import struct
 import sys
 from ast import literal_eval
 from enum import IntEnum
+from functools import lru_cache
 from typing import Any, Literal, Union # Required for Literal type hint
 
 class Instruction(IntEnum):
@@ -33,18 +35,44 @@ class Instruction(IntEnum):
     HLT = 0x17
     SWAP = 0x18 # Added in a previous hypothetical change, keeping it for consistency
 
+# Small integer tags for parsed items. The emitter dispatches on item_data[0]
+# with one int comparison instead of a chain of isinstance/len probes.
+_ITEM_INSTRUCTION = 0
+_ITEM_DB_DIRECTIVE = 1
+
 # Type for parsed instructions
-_OpType = tuple[Instruction] | tuple[Instruction, int | str]
+_OpType = tuple[Literal[0], Instruction] | tuple[Literal[0], Instruction, int | str]
 # Type for DB directive data
-_DbDirectiveType = tuple[Literal["DB_DIRECTIVE"], list[int]]
+_DbDirectiveType = tuple[Literal[1], bytes]
 # Combined type for any parsable item that generates bytecode or occupies space
 _ParsedItem = Union[_OpType, _DbDirectiveType]
 
 
-_LABEL_REGEX = re.compile(r"^\[(?P<name>.*)\]$")
 _TIMES_REGEX = re.compile(
     r"^times\s+(?P<times>\d+)\s+(?P<instruction>.+)$", re.IGNORECASE
 )
+# Single tokenizing regex for a preprocessed line ('times' is already folded away
+# during preprocessing). Alternation order mirrors the old dispatch priority:
+# label, then EQU, then DB, then instruction.
+_LINE_REGEX = re.compile(
+    r"^(?:"
+    r"\[(?P<label>.*)\]"
+    r"|(?P<cname>\S+)\s+equ\s+(?P<cval>\S+)"
+    r"|(?P<dbkw>db)(?:\s+(?P<db>.+))?"
+    r"|(?P<op>\S+)(?:\s+(?P<args>.+))?"
+    r")$",
+    re.IGNORECASE,
+)
+# DB argument tokenizer: quoted strings (either quote style, with surrounding
+# whitespace) or runs without commas
+_DB_ARG_REGEX = re.compile(r"\s*'[^']*'\s*|\s*\"[^\"]*\"\s*|[^,]+")
+# Instruction-name lookup keyed by both the canonical upper-case name and its
+# casefolded form: case-insensitive input arrives casefolded and upper-case
+# mnemonics in case-sensitive mode hit directly, so the first probe succeeds in
+# both modes and the casefold fallback only runs for mixed-case spellings
+_INSTR_BY_NAME = {name: member for name, member in Instruction.__members__.items()}
+_INSTR_BY_NAME.update({name.casefold(): member for name, member in Instruction.__members__.items()})
+
 _PUSH_SIZE = {
     Instruction.PUSH1: 1,
     Instruction.PUSH2: 2,
@@ -52,6 +80,34 @@ _PUSH_SIZE = {
     Instruction.PUSH8: 8,
 }
 
+# Operand width indexed by integer opcode (0 for non-push instructions); a
+# list index replaces hashing the IntEnum on every emitted instruction
+_PUSH_SIZE_BY_OP = [0] * (max(Instruction) + 1)
+for _push_op, _push_width in _PUSH_SIZE.items():
+    _PUSH_SIZE_BY_OP[_push_op] = _push_width
+
+# Precompiled little-endian packers by operand width; a compiled Struct skips
+# the per-call format parsing of int.to_bytes / struct.pack with a format string
+_PACKERS = {
+    1: struct.Struct("<B"),
+    2: struct.Struct("<H"),
+    4: struct.Struct("<I"),
+    8: struct.Struct("<Q"),
+}
+
+
+
+@lru_cache(maxsize=4096)
+def _eval_literal(text: str):
+    """
+    Evaluates a literal token, caching results across calls; operand and DB
+    tokens repeat heavily in real programs. int(text, 0) covers the common
+    numeric spellings (decimal, 0x/0o/0b) without building an AST.
+    """
+    try:
+        return int(text, 0)
+    except ValueError:
+        return literal_eval(text)
 
 class AssemblyError(ValueError):
     def __init__(self, message: str, line_num: int | None = None, line_content: str | None = None):
@@ -65,333 +121,279 @@ class AssemblyError(ValueError):
         self.line_content = line_content
 
 
-def _preprocess_assembly(asm: str, case_sensitive: bool) -> list[tuple[int, str, str]]:
+def _preprocess_assembly(asm: str, case_sensitive: bool) -> list[tuple[int, str, str, int]]:
     """
     Preprocesses the assembly code string.
     Removes comments, empty lines, handles case sensitivity, and tracks original line numbers.
-    Expands 'times' directives.
-    Returns: list of (original_line_number, original_line_text, cleaned_and_case_adjusted_line_content)
+    'times' directives are recorded as a repeat count instead of being expanded into
+    N copies of the line, so preprocessing stays linear in source size.
+    Returns: list of (original_line_number, original_line_text, cleaned_line_content, repeat_count)
     """
-    processed_lines_with_meta: list[tuple[int, str, str]] = []
-    raw_lines = asm.splitlines()
-    
-    temp_lines_to_process: list[tuple[int, str, str]] = []
-    for i, line_content in enumerate(raw_lines):
-        temp_lines_to_process.append((i + 1, line_content, line_content))
+    processed_lines_with_meta: list[tuple[int, str, str, int]] = []
 
-    idx = 0
-    while idx < len(temp_lines_to_process):
-        line_num, original_line_text, current_processing_text = temp_lines_to_process[idx]
-        idx += 1
-
-        line_for_logic = current_processing_text.split(';', 1)[0].strip()
+    for i, original_line_text in enumerate(asm.splitlines()):
+        line_num = i + 1
+        line_for_logic = original_line_text.split(';', 1)[0].strip()
 
         if not case_sensitive:
             line_for_logic = line_for_logic.casefold()
-        
+
         if not line_for_logic:
             continue
 
+        # Fold (possibly nested) 'times' prefixes into one multiplier.
+        # The regex only admits digits, so the count is always a valid non-negative int.
+        repeat = 1
         times_match = _TIMES_REGEX.match(line_for_logic)
-        if times_match:
-            try:
-                times_count_str = times_match.group("times")
-                times_count = int(times_count_str)
-                instruction_to_repeat = times_match.group("instruction").strip()
-                if times_count < 0:
-                    raise AssemblyError(f"Negative repeat count ({times_count}) for 'times' directive.", line_num, original_line_text)
-                
-                expansion = [(line_num, original_line_text, instruction_to_repeat)] * times_count
-                temp_lines_to_process[idx:idx] = expansion
-            except ValueError:
-                 raise AssemblyError(f"Invalid number '{times_count_str}' for 'times' directive.", line_num, original_line_text)
+        while times_match:
+            repeat *= int(times_match.group("times"))
+            line_for_logic = times_match.group("instruction").strip()
+            times_match = _TIMES_REGEX.match(line_for_logic)
+
+        if repeat == 0:
             continue
-        
-        processed_lines_with_meta.append((line_num, original_line_text, line_for_logic))
-        
+
+        processed_lines_with_meta.append((line_num, original_line_text, line_for_logic, repeat))
+
     return processed_lines_with_meta
 
 
 def _parse_single_line(
     line_num: int,
-    line_content: str, 
-    original_line_text: str, 
+    line_content: str,
+    original_line_text: str,
     constants: dict[str, int],
-    case_sensitive_constants: bool
 ) -> tuple[Literal["instruction", "label", "constant_def", "db_directive"], Any]:
     """
     Parses a single preprocessed line of assembly.
+    In case-insensitive mode the whole line was casefolded once during preprocessing,
+    so names taken from it are already normalized lookup keys.
     Returns a tuple indicating type and parsed data.
     """
-    label_match = _LABEL_REGEX.match(line_content)
-    if label_match:
-        label_name = label_match.group("name")
-        return "label", label_name
-
-    components = [comp.strip() for comp in line_content.split(maxsplit=1)] # Split only on the first space for DB
-    if not components:
+    line_match = _LINE_REGEX.match(line_content)
+    if line_match is None:
         raise AssemblyError("Line became empty after splitting, unexpected.", line_num, original_line_text)
 
-    keyword_raw = components[0]
-    keyword_upper = keyword_raw.upper()
+    label_name = line_match.group("label")
+    if label_name is not None:
+        return "label", label_name
 
     # Constant definition: e.g., MY_CONST EQU 10
-    # Need to split fully for this. Re-split if keyword might be a const name.
-    full_components = [comp.strip() for comp in line_content.split()]
-    if len(full_components) == 3 and full_components[1].upper() == "EQU":
-        const_name_from_source = full_components[0]
-        const_name_key = const_name_from_source if case_sensitive_constants else const_name_from_source.casefold()
+    const_name_from_source = line_match.group("cname")
+    if const_name_from_source is not None:
+        const_value_str = line_match.group("cval")
         try:
-            const_value_str = full_components[2]
-            const_value = int(literal_eval(const_value_str))
-            return "constant_def", (const_name_key, const_value, const_name_from_source)
+            const_value = int(_eval_literal(const_value_str))
+            return "constant_def", (const_name_from_source, const_value, const_name_from_source)
         except (ValueError, SyntaxError) as e:
-            raise AssemblyError(f"Invalid value '{full_components[2]}' for constant '{const_name_from_source}'. Details: {e}", line_num, original_line_text)
+            raise AssemblyError(f"Invalid value '{const_value_str}' for constant '{const_name_from_source}'. Details: {e}", line_num, original_line_text)
 
     # DB Directive: e.g., DB 10, 0xFF, 'A', "Hello"
-    if keyword_upper == "DB":
-        if len(components) < 2 or not components[1].strip():
+    if line_match.group("dbkw") is not None:
+        args_str = line_match.group("db")
+        if not args_str or not args_str.strip():
             raise AssemblyError("DB directive requires arguments.", line_num, original_line_text)
-        
-        args_str = components[1]
-        byte_values: list[int] = []
-        
-        # Simple comma-separated parser, allowing strings to contain commas if quoted.
-        # This regex splits by comma, but respects commas inside quotes.
-        # More robust parsing might be needed for complex escape sequences within strings.
-        # For now, rely on literal_eval for individual items.
-        
-        # This is a tricky part: "DB 'a,b', 'c'" vs "DB 'a', 'b', 'c'"
-        # A full CSV parser or more sophisticated regex is better.
-        # Let's use a simpler split by comma and then try to stitch quoted strings.
-        # This is a basic approach and might have limitations.
-        
-        raw_args = []
-        current_arg = ""
-        in_single_quote = False
-        in_double_quote = False
-        for char in args_str:
-            if char == "'" and not in_double_quote:
-                in_single_quote = not in_single_quote
-            elif char == '"' and not in_single_quote:
-                in_double_quote = not in_double_quote
-            
-            if char == ',' and not in_single_quote and not in_double_quote:
-                raw_args.append(current_arg.strip())
-                current_arg = ""
-            else:
-                current_arg += char
-        raw_args.append(current_arg.strip()) # Add the last argument
+
+        # bytearray stores each byte as one byte instead of a boxed Python int,
+        # and later copies out of it are C-level memcpys
+        byte_values = bytearray()
+
+        # Comma-separated arguments; commas inside quoted strings are not
+        # separators. The tokenizer regex runs in C instead of walking the
+        # string char-by-char; literal_eval still validates each item.
+        raw_args = [arg.strip() for arg in _DB_ARG_REGEX.findall(args_str)]
 
         for arg_item_str in raw_args:
             if not arg_item_str:
                 continue # Skip empty items that might result from trailing commas
             try:
-                val = literal_eval(arg_item_str)
+                val = _eval_literal(arg_item_str)
                 if isinstance(val, int):
                     if not (0 <= val <= 255):
                         raise AssemblyError(f"Byte value '{arg_item_str}' out of range (0-255).", line_num, original_line_text)
                     byte_values.append(val)
                 elif isinstance(val, str):
-                    for char_in_str in val:
-                        byte_val = ord(char_in_str)
-                        if not (0 <= byte_val <= 255) : # Should not happen for typical strings
-                             raise AssemblyError(f"Character '{char_in_str}' in string \"{val}\" is not a valid byte.", line_num, original_line_text)
-                        byte_values.append(byte_val)
+                    # latin-1 maps U+0000..U+00FF straight to byte values, so the
+                    # whole string is encoded and range-checked in one C call
+                    try:
+                        byte_values.extend(val.encode('latin-1'))
+                    except UnicodeEncodeError as enc_err:
+                        raise AssemblyError(f"Character '{val[enc_err.start]}' in string \"{val}\" is not a valid byte.", line_num, original_line_text)
                 else:
                     raise AssemblyError(f"Unsupported type for DB argument: '{arg_item_str}' (evaluates to {type(val)}).", line_num, original_line_text)
             except (ValueError, SyntaxError, TypeError) as e:
                 raise AssemblyError(f"Invalid DB argument: '{arg_item_str}'. Details: {e}", line_num, original_line_text)
-        return "db_directive", byte_values
+        return "db_directive", (_ITEM_DB_DIRECTIVE, bytes(byte_values))
 
 
-    # Instruction parsing (use full_components for this)
-    try:
-        op = Instruction[keyword_upper] # keyword_upper is from components[0]
-    except KeyError:
+    # Instruction parsing; the table carries both canonical and casefolded
+    # names, so the fallback probe only runs for mixed-case mnemonics
+    keyword_raw = line_match.group("op")
+    op = _INSTR_BY_NAME.get(keyword_raw)
+    if op is None:
+        op = _INSTR_BY_NAME.get(keyword_raw.casefold())
+    if op is None:
         raise AssemblyError(f"Unknown instruction or directive: '{keyword_raw}'", line_num, original_line_text)
 
-    if len(full_components) == 1:
-        return "instruction", (op,)
-    elif len(full_components) == 2:
-        arg_str = full_components[1]
+    args_part = line_match.group("args")
+    if args_part is None:
+        return "instruction", (_ITEM_INSTRUCTION, op)
+    arg_tokens = args_part.split()
+    if len(arg_tokens) == 1:
+        arg_str = arg_tokens[0]
         try:
-            arg_val = int(literal_eval(arg_str))
-        except (ValueError, SyntaxError): 
-            constant_lookup_key = arg_str if case_sensitive_constants else arg_str.casefold()
-            arg_val = constants.get(constant_lookup_key, arg_str) 
-        return "instruction", (op, arg_val)
+            arg_val = int(_eval_literal(arg_str))
+        except (ValueError, SyntaxError):
+            arg_val = constants.get(arg_str, arg_str)
+        return "instruction", (_ITEM_INSTRUCTION, op, arg_val)
     else:
         raise AssemblyError(f"Invalid line format or too many components for instruction '{keyword_raw}'.", line_num, original_line_text)
 
 
-def _resolve_addresses(
-    parsed_items: list[tuple[int, str, _ParsedItem]], 
-    labels_info: dict[int, tuple[int, str, str]], 
-    case_sensitive_labels: bool
-) -> dict[str, int]:
-    """Calculates the bytecode address for each label, considering instructions and DB directives."""
-    final_label_offsets: dict[str, int] = {} 
-    current_address = 0
-    label_definitions_meta: dict[str, tuple[int, str, str]] = {}
-
-    for idx, (line_num, original_line, item_data) in enumerate(parsed_items):
-        if idx in labels_info:
-            label_line_num, label_original_line, label_name_from_source = labels_info[idx]
-            label_key = label_name_from_source if case_sensitive_labels else label_name_from_source.casefold()
-            
-            if label_key in final_label_offsets:
-                first_def_line_num, _, first_def_name = label_definitions_meta[label_key]
-                raise AssemblyError(f"Label '{label_name_from_source}' redefined. First defined as '{first_def_name}' on line {first_def_line_num}.",
-                                    label_line_num, label_original_line)
-            final_label_offsets[label_key] = current_address
-            label_definitions_meta[label_key] = (label_line_num, label_original_line, label_name_from_source)
-        
-        # Check if item_data is an _OpType (instruction)
-        if isinstance(item_data, tuple) and len(item_data) > 0 and isinstance(item_data[0], Instruction):
-            op = item_data[0]
-            args = item_data[1:]
-            current_address += 1  # Opcode
-            if op in _PUSH_SIZE:
-                if not args: 
-                    raise AssemblyError(f"Instruction {op.name} expects an argument.", line_num, original_line)
-                current_address += _PUSH_SIZE[op]
-            elif args: 
-                current_address += 1 + 8  # PUSH8 opcode + 8 bytes
-        # Check if item_data is a _DbDirectiveType
-        elif isinstance(item_data, tuple) and len(item_data) == 2 and item_data[0] == "DB_DIRECTIVE":
-            byte_list = item_data[1]
-            current_address += len(byte_list)
-        else:
-            # This case should not be reached if parsing is correct
-            raise AssemblyError(f"Unknown item type encountered during address resolution on line {line_num}.", line_num, original_line)
-            
-    return final_label_offsets
+# A pending patch for a forward label reference:
+# (relative_offset_in_segment, label_key, width_in_bytes, error_suffix)
+_Fixup = tuple[int, str, int, str]
 
 
-def _generate_bytecode_for_item(
+def _emit_item(
     item_data: _ParsedItem,
     final_label_offsets: dict[str, int],
-    case_sensitive_labels: bool,
-    line_num: int, 
-    original_line_text: str 
-) -> bytes:
-    """Generates bytecode for a single parsed item (instruction or DB directive)."""
+    line_num: int,
+    original_line_text: str
+) -> tuple[bytes, _Fixup | None]:
+    """
+    Generates bytecode for a single parsed item (instruction or DB directive).
+    Backward label references are resolved immediately; a forward reference is
+    emitted as zero bytes and described by the returned fixup so the caller can
+    patch it in place once all label offsets are known.
+    """
     bytecode_segment = bytearray()
+    fixup: _Fixup | None = None
 
     # Handle Instructions (_OpType)
-    if isinstance(item_data, tuple) and len(item_data) > 0 and isinstance(item_data[0], Instruction):
-        op_tuple = item_data # item_data is _OpType here
-        op = op_tuple[0]
-        args = op_tuple[1:] 
-        arg_value_runtime = args[0] if args else None
+    if item_data[0] == _ITEM_INSTRUCTION:
+        op = item_data[1]
+        arg_value_runtime = item_data[2] if len(item_data) > 2 else None
 
-        is_push_variant = op in _PUSH_SIZE
+        push_width = _PUSH_SIZE_BY_OP[op]
+        is_push_variant = push_width != 0
         has_argument_value = arg_value_runtime is not None
 
-        if has_argument_value and not is_push_variant: 
+        if has_argument_value and not is_push_variant:
             bytecode_segment.append(Instruction.PUSH8)
             resolved_numeric_arg: int
-            if isinstance(arg_value_runtime, str): 
-                label_name_for_lookup = arg_value_runtime
-                label_key = label_name_for_lookup if case_sensitive_labels else label_name_for_lookup.casefold()
-                resolved_address = final_label_offsets.get(label_key)
+            if isinstance(arg_value_runtime, str):
+                resolved_address = final_label_offsets.get(arg_value_runtime)
                 if resolved_address is None:
-                    raise AssemblyError(f"Undefined label: '{arg_value_runtime}'", line_num, original_line_text)
-                resolved_numeric_arg = resolved_address
+                    fixup = (len(bytecode_segment), arg_value_runtime, 8, "")
+                    resolved_numeric_arg = 0
+                else:
+                    resolved_numeric_arg = resolved_address
             elif isinstance(arg_value_runtime, int):
                 resolved_numeric_arg = arg_value_runtime
-            else: 
+            else:
                 raise AssemblyError(f"Invalid argument type '{type(arg_value_runtime).__name__}' for implicit PUSH8.", line_num, original_line_text)
-            bytecode_segment += resolved_numeric_arg.to_bytes(8, "little")
+            bytecode_segment += _PACKERS[8].pack(resolved_numeric_arg)
 
-        bytecode_segment.append(op) 
+        bytecode_segment.append(op)
 
         if is_push_variant:
-            if not has_argument_value: 
-                raise AssemblyError(f"Instruction {op.name} expects an argument but none provided.", line_num, original_line_text)
-            
+            if not has_argument_value:
+                raise AssemblyError(f"Instruction {op.name} expects an argument.", line_num, original_line_text)
+
             resolved_numeric_arg_push: int
-            if isinstance(arg_value_runtime, str): 
-                label_name_for_lookup = arg_value_runtime
-                label_key = label_name_for_lookup if case_sensitive_labels else label_name_for_lookup.casefold()
-                resolved_address = final_label_offsets.get(label_key)
+            if isinstance(arg_value_runtime, str):
+                resolved_address = final_label_offsets.get(arg_value_runtime)
                 if resolved_address is None:
-                    raise AssemblyError(f"Undefined label: '{arg_value_runtime}' used with {op.name}.", line_num, original_line_text)
-                resolved_numeric_arg_push = resolved_address
+                    fixup = (len(bytecode_segment), arg_value_runtime, push_width, f" used with {op.name}.")
+                    resolved_numeric_arg_push = 0
+                else:
+                    resolved_numeric_arg_push = resolved_address
             elif isinstance(arg_value_runtime, int):
                 resolved_numeric_arg_push = arg_value_runtime
-            else: 
+            else:
                 raise AssemblyError(f"Argument for {op.name} must be an integer or a resolvable label, got type '{type(arg_value_runtime).__name__}'.", line_num, original_line_text)
-            bytecode_segment += resolved_numeric_arg_push.to_bytes(_PUSH_SIZE[op], "little")
-    
+            bytecode_segment += _PACKERS[push_width].pack(resolved_numeric_arg_push)
+
     # Handle DB Directives (_DbDirectiveType)
-    elif isinstance(item_data, tuple) and len(item_data) == 2 and item_data[0] == "DB_DIRECTIVE":
-        byte_list = item_data[1]
-        bytecode_segment.extend(byte_list)
+    elif item_data[0] == _ITEM_DB_DIRECTIVE:
+        bytecode_segment += item_data[1]
     else:
         # This case should not be reached if parsing and item structure are correct
         raise AssemblyError(f"Unknown item type encountered during bytecode generation on line {line_num}.", line_num, original_line_text)
-        
-    return bytes(bytecode_segment)
 
+    return bytes(bytecode_segment), fixup
 
-def assemble(asm: str, case_sensitive: bool = False) -> bytes:
-    case_sensitive_labels = case_sensitive
-    case_sensitive_constants = case_sensitive
 
+def assemble(asm: str, case_sensitive: bool = False) -> bytearray:
+    # Case normalization happens once in preprocessing: in case-insensitive mode
+    # every line is casefolded there, so all later name lookups use keys as-is.
+    # The emission buffer is returned as-is (no final copy into immutable
+    # bytes); callers that need an immutable result can wrap it in bytes().
     try:
         preprocessed_asm_lines = _preprocess_assembly(asm, case_sensitive)
-    except AssemblyError: 
-        raise 
+    except AssemblyError:
+        raise
 
-    parsed_items_with_meta: list[tuple[int, str, _ParsedItem]] = []
-    constants: dict[str, int] = {} 
-    labels_by_item_index: dict[int, tuple[int, str, str]] = {} 
+    # Single fused pass: parse each line, bind labels to the current output
+    # offset, and emit bytecode immediately. Forward label references are
+    # emitted as placeholders and patched in place afterwards.
+    final_bytecode = bytearray()
+    final_label_offsets: dict[str, int] = {}
+    label_definitions_meta: dict[str, tuple[int, str]] = {}
+    constants: dict[str, int] = {}
+    # (absolute_offset, label_key, width, error_suffix, line_num, original_line)
+    pending_fixups: list[tuple[int, str, int, str, int, str]] = []
 
-    for line_num, original_line_text, cleaned_line_content in preprocessed_asm_lines:
+    for line_num, original_line_text, cleaned_line_content, repeat in preprocessed_asm_lines:
         try:
             parse_type, parsed_data = _parse_single_line(
-                line_num, cleaned_line_content, original_line_text, constants, case_sensitive_constants
+                line_num, cleaned_line_content, original_line_text, constants
             )
 
-            if parse_type == "instruction":
-                parsed_items_with_meta.append((line_num, original_line_text, parsed_data))
-            elif parse_type == "db_directive":
-                # parsed_data is the list of byte values
-                parsed_items_with_meta.append((line_num, original_line_text, ("DB_DIRECTIVE", parsed_data)))
-            elif parse_type == "label":
-                label_name_from_parser = parsed_data 
-                current_item_index = len(parsed_items_with_meta)
-                labels_by_item_index[current_item_index] = (line_num, original_line_text, label_name_from_parser)
+            if parse_type == "label":
+                label_key = parsed_data
+                existing_offset = final_label_offsets.get(label_key)
+                if existing_offset is not None and existing_offset != len(final_bytecode):
+                    first_def_line_num, first_def_name = label_definitions_meta[label_key]
+                    raise AssemblyError(f"Label '{parsed_data}' redefined. First defined as '{first_def_name}' on line {first_def_line_num}.",
+                                        line_num, original_line_text)
+                final_label_offsets[label_key] = len(final_bytecode)
+                label_definitions_meta[label_key] = (line_num, parsed_data)
             elif parse_type == "constant_def":
                 const_key, const_value, const_name_from_source = parsed_data
-                if const_key in constants: 
+                # A repeated definition is a redefinition, whether spelled twice or via 'times'.
+                if const_key in constants or repeat > 1:
                     raise AssemblyError(f"Constant '{const_name_from_source}' redefined.", line_num, original_line_text)
                 constants[const_key] = const_value
-        except AssemblyError: 
+            else:
+                item_bytes, fixup = _emit_item(
+                    parsed_data, final_label_offsets, line_num, original_line_text
+                )
+                segment_base = len(final_bytecode)
+                # bytes multiplication is a single C-level memcpy per copy
+                final_bytecode.extend(item_bytes * repeat if repeat != 1 else item_bytes)
+                if fixup is not None:
+                    rel_offset, label_key, width, error_suffix = fixup
+                    for copy_index in range(repeat):
+                        pending_fixups.append((segment_base + copy_index * len(item_bytes) + rel_offset,
+                                               label_key, width, error_suffix, line_num, original_line_text))
+        except AssemblyError:
             raise
-        except Exception as e: 
+        except Exception as e:
             raise AssemblyError(f"Unexpected parsing error: {e}", line_num, original_line_text)
 
-    try:
-        final_label_offsets = _resolve_addresses(parsed_items_with_meta, labels_by_item_index, case_sensitive_labels)
-    except AssemblyError: 
-        raise
-
-    final_bytecode = bytearray()
-    for line_num, original_line_text, item_data in parsed_items_with_meta:
+    # Patch forward references now that every label offset is known.
+    for offset, label_key, width, error_suffix, line_num, original_line_text in pending_fixups:
+        resolved_address = final_label_offsets.get(label_key)
+        if resolved_address is None:
+            raise AssemblyError(f"Undefined label: '{label_key}'{error_suffix}", line_num, original_line_text)
         try:
-            item_bytes = _generate_bytecode_for_item(
-                item_data, final_label_offsets, case_sensitive_labels, line_num, original_line_text
-            )
-            final_bytecode.extend(item_bytes)
-        except AssemblyError: 
-            raise
-        except Exception as e: 
-             raise AssemblyError(f"Unexpected bytecode generation error: {e}", line_num, original_line_text)
-             
-    return bytes(final_bytecode)
+            _PACKERS[width].pack_into(final_bytecode, offset, resolved_address)
+        except struct.error as e:
+            raise AssemblyError(f"Unexpected bytecode generation error: {e}", line_num, original_line_text)
+
+    return final_bytecode
 
 
 if __name__ == "__main__":